@@ -3,31 +3,44 @@
 __version__ = "1.3.0"
 
 from .const import (
-    ANSI_ESCAPE,
+    CLOCK_TICKS,
     DEFAULT_CONFIG,
     DESTROYED_SERVICE_TTL_DEFAULT,
     EVENTS_DEFAULT,
+    HA_TOPIC_TRANSLATION,
     HOMEASSISTANT_PREFIX_DEFAULT,
     HOMEASSISTANT_SINGLE_DEVICE_DEFAULT,
     INVALID_HA_TOPIC_CHARS,
+    JOB_TYPE_STATES,
     LOG_LEVEL_DEFAULT,
+    LOOP_IDLE_TIMEOUT,
     MAX_QUEUE_SIZE,
     MQTT_CLIENT_ID_DEFAULT,
+    MQTT_MAX_INFLIGHT_MESSAGES,
     MQTT_PORT_DEFAULT,
     MQTT_QOS_DEFAULT,
+    MQTT_STATS_QOS_DEFAULT,
     MQTT_TIMEOUT_DEFAULT,
     MQTT_TOPIC_PREFIX_DEFAULT,
+    PAGE_SIZE,
+    PROC_PPID_RE,
+    PROC_STAT_PATH,
+    PROC_STATUS_GLOB,
+    PROC_STATUS_READ_SIZE,
+    SERVICE_FILTER_CACHE_SIZE,
     STATS_DEFAULT,
     STATS_RECORD_SECONDS_DEFAULT,
     STATS_REGISTRATION_ENTRIES,
-    SYSTEMCTL_CHILD_PID_POST_CMD,
-    SYSTEMCTL_CHILD_PID_PRE_CMD,
+    STATS_VALUE_TEMPLATES,
+    STREAM_BUFFER_SIZE,
+    STREAM_ENV_OVERRIDES,
+    SYSTEMCTL2MQTT_HOSTNAME_DEFAULT,
     SYSTEMCTL_EVENTS_CMD,
     SYSTEMCTL_LIST_CMD,
     SYSTEMCTL_PID_PRE_CMD,
-    SYSTEMCTL_STATS_CMD,
     SYSTEMCTL_VERSION_CMD,
     WATCHED_EVENTS,
+    WATCHED_EVENTS_RE,
 )
 from .exceptions import (
     Systemctl2MqttConfigException,
@@ -36,7 +49,16 @@ from .exceptions import (
     Systemctl2MqttException,
     Systemctl2MqttStatsException,
 )
-from .helpers import clean_for_discovery
+from .helpers import (
+    apply_overrides,
+    clean_for_discovery,
+    compile_service_filter,
+    json_loads,
+    json_payload,
+    read_proc_stat,
+    sanitize_topic,
+    scan_proc_tree,
+)
 from .systemctl2mqtt import Systemctl2Mqtt
 from .type_definitions import (
     PIDStats,
@@ -55,7 +77,14 @@ from .type_definitions import (
 
 __all__ = [
     "Systemctl2Mqtt",
+    "apply_overrides",
     "clean_for_discovery",
+    "compile_service_filter",
+    "json_loads",
+    "json_payload",
+    "read_proc_stat",
+    "sanitize_topic",
+    "scan_proc_tree",
     "ServiceEvent",
     "PIDStats",
     "ServiceStats",
@@ -76,22 +105,35 @@ __all__ = [
     "MQTT_PORT_DEFAULT",
     "MQTT_TIMEOUT_DEFAULT",
     "MQTT_TOPIC_PREFIX_DEFAULT",
+    "MQTT_MAX_INFLIGHT_MESSAGES",
     "MQTT_QOS_DEFAULT",
+    "MQTT_STATS_QOS_DEFAULT",
     "EVENTS_DEFAULT",
     "STATS_DEFAULT",
     "STATS_RECORD_SECONDS_DEFAULT",
     "WATCHED_EVENTS",
+    "JOB_TYPE_STATES",
+    "WATCHED_EVENTS_RE",
     "MAX_QUEUE_SIZE",
+    "SERVICE_FILTER_CACHE_SIZE",
+    "LOOP_IDLE_TIMEOUT",
+    "STREAM_BUFFER_SIZE",
+    "STREAM_ENV_OVERRIDES",
+    "SYSTEMCTL2MQTT_HOSTNAME_DEFAULT",
     "SYSTEMCTL_EVENTS_CMD",
     "SYSTEMCTL_LIST_CMD",
     "SYSTEMCTL_PID_PRE_CMD",
-    "SYSTEMCTL_CHILD_PID_PRE_CMD",
-    "SYSTEMCTL_CHILD_PID_POST_CMD",
-    "SYSTEMCTL_STATS_CMD",
     "SYSTEMCTL_VERSION_CMD",
     "INVALID_HA_TOPIC_CHARS",
-    "ANSI_ESCAPE",
+    "HA_TOPIC_TRANSLATION",
+    "PROC_STATUS_GLOB",
+    "PROC_STATUS_READ_SIZE",
+    "PROC_PPID_RE",
+    "PROC_STAT_PATH",
+    "CLOCK_TICKS",
+    "PAGE_SIZE",
     "STATS_REGISTRATION_ENTRIES",
+    "STATS_VALUE_TEMPLATES",
     "DEFAULT_CONFIG",
     "Systemctl2MqttEventsException",
     "Systemctl2MqttStatsException",
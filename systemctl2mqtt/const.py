@@ -1,11 +1,20 @@
 """systemctl2mqtt const."""
 
 # Env config
+from collections.abc import Mapping
+import os
 import re
 import socket
+from types import MappingProxyType
+from typing import Final, cast
 
-from .type_definitions import Systemctl2MqttConfig
+from .type_definitions import (
+    ServiceEventStateType,
+    ServiceEventStatusType,
+    Systemctl2MqttConfig,
+)
 
+SYSTEMCTL2MQTT_HOSTNAME_DEFAULT: Final[str] = socket.gethostname()  # resolved once
 LOG_LEVEL_DEFAULT = "INFO"
 HOMEASSISTANT_PREFIX_DEFAULT = "homeassistant"
 HOMEASSISTANT_SINGLE_DEVICE_DEFAULT = False
@@ -14,6 +23,8 @@ MQTT_PORT_DEFAULT = 1883
 MQTT_TIMEOUT_DEFAULT = 30  # s
 MQTT_TOPIC_PREFIX_DEFAULT = "systemctl"
 MQTT_QOS_DEFAULT = 1
+MQTT_STATS_QOS_DEFAULT = 0
+MQTT_MAX_INFLIGHT_MESSAGES = 65535  # highest mqtt packet id
 DESTROYED_SERVICE_TTL_DEFAULT = 24 * 60 * 60  # s
 SERVICE_WHITELIST: list[str] = []
 SERVICE_BLACKLIST: list[str] = []
@@ -22,22 +33,73 @@ STATS_DEFAULT = False
 STATS_RECORD_SECONDS_DEFAULT = 30  # s
 
 # Const
-WATCHED_EVENTS = (
-    "restart",
-    "start",
-    "stop",
-    "reload",
+WATCHED_EVENTS = frozenset(
+    (
+        "restart",
+        "start",
+        "stop",
+        "reload",
+    )
+)
+# The status on success and the state of a service after a finished job, a failed job sets the status to failed
+JOB_TYPE_STATES: Final[
+    Mapping[str, tuple[ServiceEventStatusType, ServiceEventStateType]]
+] = MappingProxyType(
+    {
+        "start": ("running", "on"),
+        "stop": ("exited", "off"),
+        "restart": ("exited", "off"),
+    }
 )
-MAX_QUEUE_SIZE = 100
-SYSTEMCTL_EVENTS_CMD = ["journalctl", "_COMM=systemd", "--output=json", "-f", "-n", "0"]
+WATCHED_EVENTS_RE = re.compile(
+    # Pre-filter the raw journalctl json lines before decoding them
+    rb'"JOB_TYPE"\s*:\s*"(?:'
+    + "|".join(sorted(WATCHED_EVENTS)).encode()
+    + rb')"|"MESSAGE"\s*:\s*"Reloading\."'
+)
+MAX_QUEUE_SIZE = 4096  # entries, holds a burst of events or a stats round
+SERVICE_FILTER_CACHE_SIZE = 1024
+LOOP_IDLE_TIMEOUT = 1  # s, also paces the restarts of failing threads
+STREAM_BUFFER_SIZE = 64 * 1024  # bytes
+STREAM_ENV_OVERRIDES = {
+    # Disable colored output of the streamed commands at the source
+    "NO_COLOR": "1",
+    "SYSTEMD_COLORS": "0",
+    "TERM": "dumb",
+}
+SYSTEMCTL_EVENTS_CMD = [
+    "journalctl",
+    "_COMM=systemd",
+    "--output=json",
+    "--output-fields=UNIT,MESSAGE,JOB_TYPE,JOB_RESULT",
+    "-f",
+    "-n",
+    "0",
+]
 SYSTEMCTL_LIST_CMD = ["systemctl", "--type=service", "--output=json", "--no-pager"]
 SYSTEMCTL_PID_PRE_CMD = ["systemctl", "show", "--property=MainPID", "--value"]
-SYSTEMCTL_CHILD_PID_PRE_CMD = ["ps", "--ppid"]
-SYSTEMCTL_CHILD_PID_POST_CMD = ["-o", "pid="]
-SYSTEMCTL_STATS_CMD = ["top", "-b", "-d", "1"]
-SYSTEMCTL_VERSION_CMD = ["systemctl", "--version", "|", "grep", "systemd"]
+SYSTEMCTL_VERSION_CMD = ["systemctl", "--version"]
 INVALID_HA_TOPIC_CHARS = re.compile(r"[^a-zA-Z0-9_-]")
-ANSI_ESCAPE = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
+
+
+class _HaTopicTranslation(dict[int, str]):
+    """Translation table for `str.translate`, mapping all characters outside of ASCII to an underscore."""
+
+    def __missing__(self, key: int) -> str:
+        return "_"
+
+
+HA_TOPIC_TRANSLATION = _HaTopicTranslation(
+    # List every ASCII character, so only the others end up in `__missing__`
+    (i, "_" if INVALID_HA_TOPIC_CHARS.match(chr(i)) else chr(i))
+    for i in range(128)
+)
+PROC_STATUS_GLOB = "/proc/[0-9]*/status"
+PROC_STATUS_READ_SIZE = 512  # bytes, enough to contain the PPid line
+PROC_PPID_RE = re.compile(rb"\nPPid:\s+(\d+)")
+PROC_STAT_PATH = "/proc/{}/stat"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")  # cpu time units per second in /proc
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")  # bytes
 # fmt: off
 STATS_REGISTRATION_ENTRIES = [
     # label,field,device_class,unit,icon
@@ -45,26 +107,37 @@ STATS_REGISTRATION_ENTRIES = [
     ('Memory',                  'memory',           'data_size',    'MB',   'mdi:memory'),
 ]
 # fmt: on
+STATS_VALUE_TEMPLATES = {
+    field: f"{{{{ value_json.{field} if value_json is not undefined and value_json.{field} is not undefined else None }}}}"
+    for _, field, _, _, _ in STATS_REGISTRATION_ENTRIES
+}
 
-DEFAULT_CONFIG = Systemctl2MqttConfig(
-    {
-        "log_level": LOG_LEVEL_DEFAULT,
-        "homeassistant_prefix": HOMEASSISTANT_PREFIX_DEFAULT,
-        "homeassistant_single_device": HOMEASSISTANT_SINGLE_DEVICE_DEFAULT,
-        "systemctl2mqtt_hostname": socket.gethostname(),
-        "mqtt_client_id": MQTT_CLIENT_ID_DEFAULT,
-        "mqtt_user": "",
-        "mqtt_password": "",
-        "mqtt_host": "",
-        "mqtt_port": MQTT_PORT_DEFAULT,
-        "mqtt_timeout": MQTT_TIMEOUT_DEFAULT,
-        "mqtt_topic_prefix": MQTT_TOPIC_PREFIX_DEFAULT,
-        "mqtt_qos": MQTT_QOS_DEFAULT,
-        "destroyed_service_ttl": DESTROYED_SERVICE_TTL_DEFAULT,
-        "service_whitelist": SERVICE_WHITELIST,
-        "service_blacklist": SERVICE_BLACKLIST,
-        "enable_events": EVENTS_DEFAULT,
-        "enable_stats": STATS_DEFAULT,
-        "stats_record_seconds": STATS_RECORD_SECONDS_DEFAULT,
-    }
+# Read-only at runtime, use `apply_overrides` or a copy to build a config from it
+DEFAULT_CONFIG: Final[Systemctl2MqttConfig] = cast(
+    Systemctl2MqttConfig,
+    MappingProxyType(
+        Systemctl2MqttConfig(
+            {
+                "log_level": LOG_LEVEL_DEFAULT,
+                "homeassistant_prefix": HOMEASSISTANT_PREFIX_DEFAULT,
+                "homeassistant_single_device": HOMEASSISTANT_SINGLE_DEVICE_DEFAULT,
+                "systemctl2mqtt_hostname": SYSTEMCTL2MQTT_HOSTNAME_DEFAULT,
+                "mqtt_client_id": MQTT_CLIENT_ID_DEFAULT,
+                "mqtt_user": "",
+                "mqtt_password": "",
+                "mqtt_host": "",
+                "mqtt_port": MQTT_PORT_DEFAULT,
+                "mqtt_timeout": MQTT_TIMEOUT_DEFAULT,
+                "mqtt_topic_prefix": MQTT_TOPIC_PREFIX_DEFAULT,
+                "mqtt_qos": MQTT_QOS_DEFAULT,
+                "mqtt_stats_qos": MQTT_STATS_QOS_DEFAULT,
+                "destroyed_service_ttl": DESTROYED_SERVICE_TTL_DEFAULT,
+                "service_whitelist": SERVICE_WHITELIST,
+                "service_blacklist": SERVICE_BLACKLIST,
+                "enable_events": EVENTS_DEFAULT,
+                "enable_stats": STATS_DEFAULT,
+                "stats_record_seconds": STATS_RECORD_SECONDS_DEFAULT,
+            }
+        )
+    ),
 )
@@ -1,6 +1,27 @@
 """systemctl2mqtt helpers."""
 
-from .type_definitions import ServiceEntry
+from collections.abc import Mapping
+import glob
+import json
+import re
+from typing import Any, cast
+
+try:
+    from orjson import OPT_NON_STR_KEYS, dumps as orjson_dumps, loads as orjson_loads
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+from .const import (
+    DEFAULT_CONFIG,
+    HA_TOPIC_TRANSLATION,
+    PROC_PPID_RE,
+    PROC_STAT_PATH,
+    PROC_STATUS_GLOB,
+    PROC_STATUS_READ_SIZE,
+)
+from .type_definitions import ServiceEntry, Systemctl2MqttConfig
 
 
 def clean_for_discovery(
@@ -20,8 +41,168 @@ def clean_for_discovery(
 
     """
 
-    return {
-        k: v
-        for k, v in dict(val).items()
-        if isinstance(v, str | int | float | object) and v not in (None, "")
-    }
+    return {k: v for k, v in val.items() if v is not None and v != ""}
+
+
+def compile_service_filter(
+    entries: list[str],
+) -> tuple[frozenset[str], list[re.Pattern[str]]]:
+    """Compile the entries of a service whitelist or blacklist once for matching.
+
+    Parameters
+    ----------
+    entries
+        The entries, either literal service names (with or without .service) or regex
+
+    Returns
+    -------
+    tuple[frozenset[str], list[re.Pattern[str]]]
+        The literal service names and the compiled regex of the entries, joined into one if possible
+
+    Raises
+    ------
+    re.error
+        If an entry is not a valid regex
+
+    """
+
+    literals = frozenset(entries) | frozenset(f"{entry}.service" for entry in entries)
+    patterns = [re.compile(entry) for entry in entries]
+    # Group references of an entry would point elsewhere after groups of an earlier one
+    if len(patterns) < 2 or sum(1 for pattern in patterns if pattern.groups) > 1:
+        return literals, patterns
+    try:
+        # A single alternation matches a service in one pass instead of one per entry
+        return literals, [re.compile("|".join(f"(?:{entry})" for entry in entries))]
+    except re.error:
+        # Entries with global flags or duplicate group names only work on their own
+        return literals, patterns
+
+
+def json_loads(data: bytes | str) -> Any:
+    """Deserialize a json document, with orjson when installed.
+
+    Parameters
+    ----------
+    data
+        The json document
+
+    Returns
+    -------
+    Any
+        The deserialized object
+
+    """
+
+    if HAS_ORJSON:
+        return orjson_loads(data)
+    return json.loads(data)
+
+
+def json_payload(obj: Any) -> bytes | str:
+    """Serialize an object for a mqtt payload, with orjson when installed.
+
+    Parameters
+    ----------
+    obj
+        The object to serialize
+
+    Returns
+    -------
+    bytes | str
+        The json payload
+
+    """
+
+    if HAS_ORJSON:
+        return orjson_dumps(obj, option=OPT_NON_STR_KEYS)
+    return json.dumps(obj)
+
+
+def sanitize_topic(val: str) -> str:
+    """Replace all characters which are invalid in a home assistant discovery topic with an underscore.
+
+    Parameters
+    ----------
+    val
+        The value to sanitize
+
+    Returns
+    -------
+    str
+        The sanitized value
+
+    """
+
+    return val.translate(HA_TOPIC_TRANSLATION)
+
+
+def scan_proc_tree() -> dict[int, list[int]]:
+    """Scan the processes in /proc and map each pid to the pids of its direct children.
+
+    Returns
+    -------
+    dict[int, list[int]]
+        The child pids by parent pid
+
+    """
+
+    children: dict[int, list[int]] = {}
+    for status_path in glob.iglob(PROC_STATUS_GLOB):
+        try:
+            with open(status_path, "rb") as status_file:
+                status = status_file.read(PROC_STATUS_READ_SIZE)
+        except OSError:
+            # The process exited in the meantime
+            continue
+        match = PROC_PPID_RE.search(status)
+        if match:
+            pid = int(status_path.split("/")[2])
+            children.setdefault(int(match.group(1)), []).append(pid)
+    return children
+
+
+def read_proc_stat(pid: int) -> tuple[int, int] | None:
+    """Read the cpu time and resident memory of a process from /proc.
+
+    Parameters
+    ----------
+    pid
+        The pid of the process
+
+    Returns
+    -------
+    tuple[int, int] | None
+        The user and system cpu time in clock ticks and the resident memory in pages, or None if the process does not exist (anymore)
+
+    """
+
+    try:
+        with open(PROC_STAT_PATH.format(pid), "rb") as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return None
+    # The command name may contain spaces and parentheses, skip past its closing one
+    fields = stat[stat.rindex(b")") + 2 :].split()
+    # Fields utime (14), stime (15) and rss (24), counted from the state (3)
+    return int(fields[11]) + int(fields[12]), int(fields[21])
+
+
+def apply_overrides(overrides: Mapping[str, object]) -> Systemctl2MqttConfig:
+    """Build a config from the default config with some values overridden.
+
+    Parameters
+    ----------
+    overrides
+        The config values to override the defaults with
+
+    Returns
+    -------
+    Systemctl2MqttConfig
+        The config
+
+    """
+
+    cfg = dict(DEFAULT_CONFIG)
+    cfg.update(overrides)
+    return cast(Systemctl2MqttConfig, cfg)
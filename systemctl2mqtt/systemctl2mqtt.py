@@ -2,44 +2,52 @@
 """Listens to systemctl events and stats for services and sends it to mqtt and supports discovery for home assistant."""
 
 import argparse
-import datetime
+from collections import defaultdict, deque
+from functools import lru_cache
 import json
 import logging
+import os
 import platform
-from queue import Empty, Queue
 import re
 import signal
-import socket
 import subprocess
 import sys
-from threading import Thread
-from time import sleep, time
+from threading import Event, Thread
+from time import monotonic, sleep
 from typing import Any
 
 import paho.mqtt.client
 
 from . import __version__
 from .const import (
-    ANSI_ESCAPE,
+    CLOCK_TICKS,
     DESTROYED_SERVICE_TTL_DEFAULT,
     HOMEASSISTANT_PREFIX_DEFAULT,
     HOMEASSISTANT_SINGLE_DEVICE_DEFAULT,
-    INVALID_HA_TOPIC_CHARS,
+    JOB_TYPE_STATES,
+    LOOP_IDLE_TIMEOUT,
     MAX_QUEUE_SIZE,
     MQTT_CLIENT_ID_DEFAULT,
+    MQTT_MAX_INFLIGHT_MESSAGES,
     MQTT_PORT_DEFAULT,
     MQTT_QOS_DEFAULT,
+    MQTT_STATS_QOS_DEFAULT,
     MQTT_TIMEOUT_DEFAULT,
     MQTT_TOPIC_PREFIX_DEFAULT,
+    PAGE_SIZE,
+    SERVICE_FILTER_CACHE_SIZE,
     STATS_RECORD_SECONDS_DEFAULT,
     STATS_REGISTRATION_ENTRIES,
-    SYSTEMCTL_CHILD_PID_POST_CMD,
-    SYSTEMCTL_CHILD_PID_PRE_CMD,
+    STATS_VALUE_TEMPLATES,
+    STREAM_BUFFER_SIZE,
+    STREAM_ENV_OVERRIDES,
+    SYSTEMCTL2MQTT_HOSTNAME_DEFAULT,
     SYSTEMCTL_EVENTS_CMD,
     SYSTEMCTL_LIST_CMD,
     SYSTEMCTL_PID_PRE_CMD,
-    SYSTEMCTL_STATS_CMD,
     SYSTEMCTL_VERSION_CMD,
+    WATCHED_EVENTS,
+    WATCHED_EVENTS_RE,
 )
 from .exceptions import (
     Systemctl2MqttConfigException,
@@ -48,7 +56,15 @@ from .exceptions import (
     Systemctl2MqttException,
     Systemctl2MqttStatsException,
 )
-from .helpers import clean_for_discovery
+from .helpers import (
+    clean_for_discovery,
+    compile_service_filter,
+    json_loads,
+    json_payload,
+    read_proc_stat,
+    sanitize_topic,
+    scan_proc_tree,
+)
 from .type_definitions import (
     PIDStats,
     ServiceDeviceEntry,
@@ -57,7 +73,6 @@ from .type_definitions import (
     ServiceEventStateType,
     ServiceEventStatusType,
     ServiceStats,
-    ServiceStatsRef,
     Systemctl2MqttConfig,
     SystemctlService,
 )
@@ -88,21 +103,47 @@ class Systemctl2Mqtt:
         Queue with systemctl events
     systemctl_stats
         Queue with systemctl stats
+    systemctl_wakeup
+        Event set whenever a systemctl event or stat has been queued
 
     known_event_services
         The dict with the known service events
+    pid_services
+        The index of the main and child pids of the known services to their service
     known_stat_services
-        The dict with the known service stats references
+        The monotonic time of the last processed stat of each pid of the known services
     last_stat_services
         The dict with the last service stats
+    pending_destroy_operations
+        The services marked as destroyed with the monotonic time they were marked at
+    pending_destroy_order
+        The pending destroy operations in the order they were marked, stale ones included
     mqtt
         The mqtt client
+    mqtt_connected
+        Whether the mqtt client has been connected to the broker before
+    mqtt_reconnected
+        Event set when the mqtt client has been connected again, so the retained payloads are published again
+    pending_publishes
+        The mqtt payloads waiting to be published with the next flush
+    discovery_payloads
+        The discovery topics and payloads built for each registered service
+    published_retained
+        The retained payload last published on each discovery and events topic
+    service_topics
+        The events and stats topics of each service
+    event_payload_prefixes
+        The serialized stable fields of the events payload of each service
     systemctl_events_t
         The thread to collect events from systemctl
     systemctl_stats_t
         The thread to collect stats from systemctl
     systemctl_version
         The systemctl version
+    device_model
+        The model of the home assistant devices
+    single_device
+        The device shared by all services if home assistant single device is enabled
     discovery_binary_sensor_topic
         Topic template for a binary sensor
     discovery_sensor_topic
@@ -115,6 +156,14 @@ class Systemctl2Mqtt:
         Topic template for stats
     events_topic
         Topic template for an events
+    discovery_head
+        Pre-serialized json fields shared by all discovery entries (without the closing brace)
+    service_whitelist
+        The compiled service whitelist entries
+    service_blacklist
+        The compiled service blacklist entries
+    service_filter_results
+        The cached results of filtering services by the whitelist and blacklist
     do_not_exit
         Prevent exit from within Systemctl2mqtt, when handled outside
 
@@ -128,19 +177,31 @@ class Systemctl2Mqtt:
     b_stats: bool = False
     b_events: bool = False
 
-    systemctl_events: Queue[dict[str, str]] = Queue(maxsize=MAX_QUEUE_SIZE)
-    systemctl_stats: Queue[list[str]] = Queue(maxsize=MAX_QUEUE_SIZE)
+    systemctl_events: deque[dict[str, str]]
+    systemctl_stats: deque[tuple[int, float, float, str, int]]
+    systemctl_wakeup: Event
     known_event_services: dict[str, ServiceEvent] = {}
-    known_stat_services: dict[str, dict[int, ServiceStatsRef]] = {}
-    last_stat_services: dict[str, ServiceStats | dict[str, Any]] = {}
+    pid_services: dict[int, str]
+    known_stat_services: defaultdict[str, dict[int, float]]
+    last_stat_services: dict[str, ServiceStats]
     pending_destroy_operations: dict[str, float] = {}
+    pending_destroy_order: deque[tuple[float, str]]
 
     mqtt: paho.mqtt.client.Client
+    mqtt_connected: bool
+    mqtt_reconnected: Event
+    pending_publishes: list[tuple[str, bytes | str, int, bool]]
+    discovery_payloads: dict[str, list[tuple[str, str]]]
+    published_retained: dict[str, str]
+    service_topics: dict[str, tuple[str, str]]
+    event_payload_prefixes: dict[str, tuple[tuple[str, int, list[int]], str]]
 
     systemctl_events_t: Thread
     systemctl_stats_t: Thread
 
     systemctl_version: str
+    device_model: str
+    single_device: ServiceDeviceEntry | None
 
     discovery_binary_sensor_topic: str
     discovery_sensor_topic: str
@@ -148,6 +209,11 @@ class Systemctl2Mqtt:
     version_topic: str
     stats_topic: str
     events_topic: str
+    discovery_head: str
+
+    service_whitelist: tuple[frozenset[str], list[re.Pattern[str]]]
+    service_blacklist: tuple[frozenset[str], list[re.Pattern[str]]]
+    service_filter_results: dict[str, bool]
 
     do_not_exit: bool
 
@@ -165,6 +231,22 @@ class Systemctl2Mqtt:
 
         self.cfg = cfg
         self.do_not_exit = do_not_exit
+        self.mqtt_connected = False
+        self.mqtt_reconnected = Event()
+        self.pending_publishes = []
+        self.discovery_payloads = {}
+        self.published_retained = {}
+        self.service_topics = {}
+        self.event_payload_prefixes = {}
+        self.pid_services = {}
+        self.pending_destroy_order = deque()
+        # Created on the first stat of a service
+        self.known_stat_services = defaultdict(dict)
+        self.last_stat_services = {}
+        # Bounded queues dropping the oldest entries, append and popleft are thread-safe
+        self.systemctl_events = deque(maxlen=MAX_QUEUE_SIZE)
+        self.systemctl_stats = deque(maxlen=MAX_QUEUE_SIZE)
+        self.systemctl_wakeup = Event()
 
         self.discovery_binary_sensor_topic = f"{cfg['homeassistant_prefix']}/binary_sensor/{cfg['mqtt_topic_prefix']}/{cfg['systemctl2mqtt_hostname']}_{{}}/config"
         self.discovery_sensor_topic = f"{cfg['homeassistant_prefix']}/sensor/{cfg['mqtt_topic_prefix']}/{cfg['systemctl2mqtt_hostname']}_{{}}/config"
@@ -180,6 +262,23 @@ class Systemctl2Mqtt:
         self.events_topic = (
             f"{cfg['mqtt_topic_prefix']}/{cfg['systemctl2mqtt_hostname']}/{{}}/events"
         )
+        self.discovery_head = json.dumps(
+            {
+                "availability_topic": self.status_topic,
+                "payload_available": "online",
+                "payload_not_available": "offline",
+                "qos": cfg["mqtt_qos"],
+            }
+        )[:-1]
+
+        try:
+            self.service_whitelist = compile_service_filter(cfg["service_whitelist"])
+            self.service_blacklist = compile_service_filter(cfg["service_blacklist"])
+        except re.error as ex:
+            raise Systemctl2MqttConfigException(
+                f"Invalid service whitelist or blacklist entry: {ex}"
+            ) from ex
+        self.service_filter_results = {}
 
         if self.cfg["enable_events"]:
             self.b_events = True
@@ -196,6 +295,16 @@ class Systemctl2Mqtt:
             raise Systemctl2MqttConfigException(
                 "Could not get systemctl version"
             ) from ex
+        self.device_model = (
+            f"{platform.system()} {platform.machine()} {self.systemctl_version}"
+        )
+        self.single_device = None
+        if self.cfg["homeassistant_single_device"]:
+            self.single_device = {
+                "identifiers": f"{self.cfg['systemctl2mqtt_hostname']}_{self.cfg['mqtt_topic_prefix']}",
+                "name": f"{self.cfg['systemctl2mqtt_hostname']} {self.cfg['mqtt_topic_prefix'].title()}",
+                "model": self.device_model,
+            }
 
         if not self.do_not_exit:
             main_logger.info("Register signal handlers for SIGINT and SIGTERM")
@@ -214,6 +323,9 @@ class Systemctl2Mqtt:
             self.mqtt.username_pw_set(
                 username=self.cfg["mqtt_user"], password=self.cfg["mqtt_password"]
             )
+            # Do not throttle qos>0 publishes while waiting for their acknowledgement
+            self.mqtt.max_inflight_messages_set(MQTT_MAX_INFLIGHT_MESSAGES)
+            self.mqtt.on_connect = self._on_mqtt_connect
             self.mqtt.will_set(
                 self.status_topic,
                 "offline",
@@ -226,6 +338,7 @@ class Systemctl2Mqtt:
             self.mqtt.loop_start()
             self._mqtt_send(self.status_topic, "online", retain=True)
             self._mqtt_send(self.version_topic, self.version, retain=True)
+            self._flush_pending()
 
         except paho.mqtt.client.WebsocketConnectionError as ex:
             main_logger.exception("Error while trying to connect to MQTT broker.")
@@ -234,6 +347,7 @@ class Systemctl2Mqtt:
 
         # Register services
         self._reload_services()
+        self._flush_pending()
 
         started = False
         try:
@@ -250,7 +364,7 @@ class Systemctl2Mqtt:
             if self.b_stats:
                 started = True
                 logging.info("Starting Stats thread")
-                self._start_readline_stats_thread()
+                self._start_stats_thread()
         except Exception as ex:
             main_logger.exception("Error while trying to start stats thread.")
             main_logger.debug(ex)
@@ -283,6 +397,7 @@ class Systemctl2Mqtt:
         """Cleanup the Systemctl2mqtt."""
         main_logger.warning("Shutting down gracefully.")
         try:
+            self._flush_pending()
             self._mqtt_disconnect()
         except Systemctl2MqttConnectionException as ex:
             main_logger.exception("MQTT Cleanup Failed")
@@ -303,12 +418,17 @@ class Systemctl2Mqtt:
 
         """
 
+        if self.mqtt_reconnected.is_set():
+            self._mqtt_republish()
+
         self._remove_destroyed_services()
 
         self._handle_events_queue()
 
         self._handle_stats_queue()
 
+        self._flush_pending()
+
         try:
             if self.b_events and not self.systemctl_events_t.is_alive():
                 main_logger.warning("Restarting events thread")
@@ -321,7 +441,7 @@ class Systemctl2Mqtt:
         try:
             if self.b_stats and not self.systemctl_stats_t.is_alive():
                 main_logger.warning("Restarting stats thread")
-                self._start_readline_stats_thread()
+                self._start_stats_thread()
         except Exception as e:
             main_logger.exception("Error while trying to restart stats thread.")
             main_logger.debug(e)
@@ -364,13 +484,11 @@ class Systemctl2Mqtt:
                         "Do not raise due to raise_known_exceptions=False: %s", str(ex)
                     )
 
-            # Calculate next iteration between (~0.2s and 0.001s)
-            sleep_time = 0.001 + 0.2 / MAX_QUEUE_SIZE * (
-                MAX_QUEUE_SIZE
-                - max(self.systemctl_events.qsize(), self.systemctl_stats.qsize())
-            )
-            main_logger.debug("Sleep for %.5fs until next iteration", sleep_time)
-            sleep(sleep_time)
+            # Clear before checking the queues, so no wakeup of the readers is lost
+            self.systemctl_wakeup.clear()
+            if not self.systemctl_events and not self.systemctl_stats:
+                # Idle until something is queued, checking the threads once per timeout
+                self.systemctl_wakeup.wait(LOOP_IDLE_TIMEOUT)
 
     def _get_systemctl_version(self) -> str:
         """Get the systemctl version and save it to a global value.
@@ -398,14 +516,27 @@ class Systemctl2Mqtt:
             # Check if the command was successful
             if result.returncode == 0:
                 # Extract the version information from the output
-                return result.stdout.strip()
+                return next(
+                    (
+                        line.strip()
+                        for line in result.stdout.splitlines()
+                        if "systemd" in line
+                    ),
+                    result.stdout.strip(),
+                )
             else:
                 raise Systemctl2MqttException(f"Error: {result.stderr.strip()}")
         except FileNotFoundError:
             return "Systemctl is not installed or not found in PATH."
 
-    def _mqtt_send(self, topic: str, payload: str, retain: bool = False) -> None:
-        """Send a mqtt payload to for a topic.
+    def _mqtt_send(
+        self,
+        topic: str,
+        payload: bytes | str,
+        retain: bool = False,
+        qos: int | None = None,
+    ) -> None:
+        """Queue a mqtt payload for a topic, which is sent with the next flush.
 
         Parameters
         ----------
@@ -415,6 +546,89 @@ class Systemctl2Mqtt:
             The payload to send to the topic
         retain
             Whether the payload should be retained by the mqtt server
+        qos
+            The QOS for the payload, defaults to the configured `mqtt_qos`
+
+        """
+        if main_logger.isEnabledFor(logging.DEBUG):
+            main_logger.debug("Queue for MQTT: %s: %s", topic, payload)
+        self.pending_publishes.append(
+            (topic, payload, self.cfg["mqtt_qos"] if qos is None else qos, retain)
+        )
+
+    def _on_mqtt_connect(
+        self,
+        client: Any,
+        userdata: Any,
+        flags: Any,
+        reason_code: Any,
+        properties: Any = None,
+    ) -> None:
+        """Flag a reconnect to the broker for the main loop, called by the network thread of the mqtt client.
+
+        Parameters
+        ----------
+        client
+            The mqtt client
+        userdata
+            The user data of the mqtt client
+        flags
+            The flags of the connection acknowledgement
+        reason_code
+            The reason code of the connection acknowledgement
+        properties
+            The properties of the connection acknowledgement
+
+        """
+        if reason_code.is_failure:
+            return
+        if self.mqtt_connected:
+            self.mqtt_reconnected.set()
+            self._notify_queued()
+        self.mqtt_connected = True
+
+    def _mqtt_republish(self) -> None:
+        """Publish the status and the retained payloads again after a reconnect, as the broker may have lost them.
+
+        Raises
+        ------
+        Systemctl2MqttEventsException
+            If the services could not be reloaded
+
+        """
+        self.mqtt_reconnected.clear()
+        main_logger.info(
+            "Reconnected to MQTT broker, publishing the retained payloads again"
+        )
+        self.published_retained.clear()
+        self._mqtt_send(self.status_topic, "online", retain=True)
+        self._mqtt_send(self.version_topic, self.version, retain=True)
+        try:
+            self._reload_services()
+        except Exception as ex:
+            raise Systemctl2MqttEventsException(
+                "Could not publish the services again after a reconnect"
+            ) from ex
+
+    def _mqtt_send_retained(self, topic: str, payload: str) -> None:
+        """Queue a retained mqtt payload for a topic, unless it was the last one published.
+
+        The broker keeps the last retained payload, so publishing it again changes nothing.
+
+        Parameters
+        ----------
+        topic
+            The topic to send a payload to
+        payload
+            The payload to retain on the topic
+
+        """
+        if self.published_retained.get(topic) != payload:
+            self._mqtt_send(topic, payload, retain=True)
+            self.published_retained[topic] = payload
+
+    def _flush_pending(self) -> None:
+        """Publish all pending mqtt payloads and wait for the confirmation of the last acknowledged one.
 
         Raises
         ------
@@ -422,17 +636,40 @@ class Systemctl2Mqtt:
             If the mqtt client could not send the data
 
         """
+        if not self.pending_publishes:
+            return
+
+        pending, self.pending_publishes = self.pending_publishes, []
+        acknowledged_info: paho.mqtt.client.MQTTMessageInfo | None = None
         try:
-            main_logger.debug("Sending to MQTT: %s: %s", topic, payload)
-            self.mqtt.publish(
-                topic, payload=payload, qos=self.cfg["mqtt_qos"], retain=retain
-            )
+            main_logger.debug("Sending %d payloads to MQTT", len(pending))
+            publish = self.mqtt.publish
+            for topic, payload, qos, retain in pending:
+                try:
+                    message_info = publish(
+                        topic, payload=payload, qos=qos, retain=retain
+                    )
+                except ValueError as ex:
+                    main_logger.exception("MQTT Publish to %s invalid", topic)
+                    main_logger.debug(ex)
+                    continue
+                # Only messages with a qos are acknowledged by the broker
+                if qos > 0:
+                    acknowledged_info = message_info
 
         except paho.mqtt.client.WebsocketConnectionError as ex:
             main_logger.exception("MQTT Publish Failed: %s")
             main_logger.debug(ex)
             raise Systemctl2MqttConnectionException() from ex
 
+        if acknowledged_info is None:
+            return
+        try:
+            # The broker acknowledges in order, so the last acknowledged message confirms the earlier ones
+            acknowledged_info.wait_for_publish(timeout=self.cfg["mqtt_timeout"])
+        except (ValueError, RuntimeError) as ex:
+            main_logger.warning("MQTT Publish not confirmed: %s", str(ex))
+
     def _mqtt_disconnect(self) -> None:
         """Make sure we send our last_will message.
 
@@ -449,14 +686,18 @@ class Systemctl2Mqtt:
                 qos=self.cfg["mqtt_qos"],
                 retain=True,
             )
-            self.mqtt.publish(
+            message_info = self.mqtt.publish(
                 self.version_topic,
                 self.version,
                 qos=self.cfg["mqtt_qos"],
                 retain=True,
             )
+            try:
+                # Messages are delivered in order, so only wait for the last one
+                message_info.wait_for_publish(timeout=self.cfg["mqtt_timeout"])
+            except (ValueError, RuntimeError) as ex:
+                main_logger.warning("MQTT Publish not confirmed: %s", str(ex))
             self.mqtt.disconnect()
-            sleep(1)
             self.mqtt.loop_stop()
         except paho.mqtt.client.WebsocketConnectionError as ex:
             main_logger.exception("MQTT Disconnect")
@@ -477,67 +718,102 @@ class Systemctl2Mqtt:
         try:
             thread_logger.info("Starting events thread")
             thread_logger.debug("Command: %s", SYSTEMCTL_EVENTS_CMD)
+            # The level is fixed for the thread, skip the per-line logging calls otherwise
+            log_lines = thread_logger.isEnabledFor(logging.DEBUG)
             with subprocess.Popen(
-                SYSTEMCTL_EVENTS_CMD, stdout=subprocess.PIPE, text=True
+                SYSTEMCTL_EVENTS_CMD,
+                stdout=subprocess.PIPE,
+                bufsize=STREAM_BUFFER_SIZE,
+                env={**os.environ, **STREAM_ENV_OVERRIDES},
             ) as process:
                 while True:
                     assert process.stdout
-                    line = ANSI_ESCAPE.sub("", process.stdout.readline())
-                    if line == "" and process.poll() is not None:
+                    # Json escapes control characters, so there are no ANSI sequences to strip
+                    line = process.stdout.readline()
+                    if line == b"" and process.poll() is not None:
                         break
-                    if line:
-                        line_obj = json.loads(line)
-                        if self._filter_service(line_obj["UNIT"]):
-                            thread_logger.debug("Read journalctl event line: %s", line)
-                            self.systemctl_events.put(line_obj)
-                    _rc = process.poll()
+                    if line and WATCHED_EVENTS_RE.search(line):
+                        line_obj = json_loads(line)
+                        if (
+                            line_obj.get("JOB_TYPE") in WATCHED_EVENTS
+                            or line_obj.get("MESSAGE") == "Reloading."
+                        ) and self._filter_service(line_obj["UNIT"]):
+                            if log_lines:
+                                thread_logger.debug(
+                                    "Read journalctl event line: %s", line
+                                )
+                            if len(self.systemctl_events) == MAX_QUEUE_SIZE:
+                                thread_logger.warning(
+                                    "Events queue is full, dropping the oldest event"
+                                )
+                            self.systemctl_events.append(line_obj)
+                            self._notify_queued()
         except Exception as ex:
             thread_logger.exception("Error Running Events thread")
             thread_logger.debug(ex)
             thread_logger.debug("Waiting for main thread to restart this thread")
 
-    def _start_readline_stats_thread(self) -> None:
+    def _notify_queued(self) -> None:
+        """Wake up the main loop, unless a previous wakeup is still pending.
+
+        The main loop clears the event before checking the queues, so nothing queued is missed.
+        """
+        if not self.systemctl_wakeup.is_set():
+            self.systemctl_wakeup.set()
+
+    def _start_stats_thread(self) -> None:
         """Start the stats thread."""
         self.systemctl_stats_t = Thread(
-            target=self._run_readline_stats_thread, daemon=True, name="Stats"
+            target=self._run_stats_thread, daemon=True, name="Stats"
         )
         self.systemctl_stats_t.start()
 
-    def _run_readline_stats_thread(self) -> None:
-        """Run top stats and continually read lines from it."""
+    def _run_stats_thread(self) -> None:
+        """Continually sample the cpu and memory usage of the service pids from /proc."""
         thread_logger = logging.getLogger("stats-thread")
         thread_logger.setLevel(self.cfg["log_level"].upper())
         try:
             thread_logger.info("Starting stats thread")
-            thread_logger.debug("Command: %s", SYSTEMCTL_STATS_CMD)
-            with subprocess.Popen(
-                SYSTEMCTL_STATS_CMD, stdout=subprocess.PIPE, text=True
-            ) as process:
-                while True:
-                    assert process.stdout
-                    line = ANSI_ESCAPE.sub("", process.stdout.readline())
-                    if line == "" and process.poll() is not None:
-                        break
-                    if line:
-                        stat = line.strip().split()
-                        if len(stat) > 0 and stat[0].isdigit():
-                            pid = int(stat[0])
-                            service = next(
-                                (
-                                    s["name"]
-                                    for s in self.known_event_services.values()
-                                    if s["pid"] == pid or pid in s["cpids"]
-                                ),
-                                None,
-                            )
-                            if service:
-                                thread_logger.debug("Read top stat line: %s", line)
-                                self.systemctl_stats.put(
-                                    stat
-                                    + [service]
-                                    + [str(self.known_event_services[service]["pid"])]
-                                )
-                    _rc = process.poll()
+            # Only one sample per interval is published, so sample once per interval
+            sample_seconds = max(1, self.cfg["stats_record_seconds"])
+            # The level is fixed for the thread, skip the per-pid logging calls otherwise
+            log_stats = thread_logger.isEnabledFor(logging.DEBUG)
+            last_samples: dict[int, tuple[float, int]] = {}
+            while True:
+                samples: dict[int, tuple[float, int]] = {}
+                for pid, service in self.pid_services.items():
+                    service_entry = self.known_event_services.get(service)
+                    sampled_at = monotonic()
+                    proc_stat = read_proc_stat(pid)
+                    if service_entry is None or proc_stat is None:
+                        # The service or process is gone in the meantime
+                        continue
+                    cpu_ticks, rss_pages = proc_stat
+                    samples[pid] = (sampled_at, cpu_ticks)
+                    if pid not in last_samples:
+                        # The cpu usage is only known between two samples
+                        continue
+                    last_sampled_at, last_cpu_ticks = last_samples[pid]
+                    cpu = (
+                        (cpu_ticks - last_cpu_ticks)
+                        / CLOCK_TICKS
+                        / (sampled_at - last_sampled_at)
+                        * 100
+                    )
+                    stat = (
+                        pid,
+                        round(cpu, 1),
+                        rss_pages * PAGE_SIZE / 1024,  # B --> KB
+                        service,
+                        service_entry["pid"],
+                    )
+                    if log_stats:
+                        thread_logger.debug("Read stat: %s", stat)
+                    self.systemctl_stats.append(stat)
+                if self.systemctl_stats:
+                    self._notify_queued()
+                last_samples = samples
+                sleep(sample_seconds)
         except Exception as ex:
             thread_logger.exception("Error Running Stats thread")
             thread_logger.debug(ex)
@@ -557,56 +833,53 @@ class Systemctl2Mqtt:
             The device entry config
 
         """
+        if self.single_device is not None:
+            return self.single_device
         service = service_entry["name"]
-        if not self.cfg["homeassistant_single_device"]:
-            return {
-                "identifiers": f"{self.cfg['systemctl2mqtt_hostname']}_{self.cfg['mqtt_topic_prefix']}_{service}",
-                "name": f"{self.cfg['systemctl2mqtt_hostname']} {self.cfg['mqtt_topic_prefix'].title()} {service}",
-                "model": f"{platform.system()} {platform.machine()} {self.systemctl_version}",
-            }
         return {
-            "identifiers": f"{self.cfg['systemctl2mqtt_hostname']}_{self.cfg['mqtt_topic_prefix']}",
-            "name": f"{self.cfg['systemctl2mqtt_hostname']} {self.cfg['mqtt_topic_prefix'].title()}",
-            "model": f"{platform.system()} {platform.machine()} {self.systemctl_version}",
+            "identifiers": f"{self.cfg['systemctl2mqtt_hostname']}_{self.cfg['mqtt_topic_prefix']}_{service}",
+            "name": f"{self.cfg['systemctl2mqtt_hostname']} {self.cfg['mqtt_topic_prefix'].title()} {service}",
+            "model": self.device_model,
         }
 
     def _reload_services(self) -> None:
         """Reload the service and update all enabled/disabled services."""
-        registered_services = []
-        for service_status in self._get_services():
-            status_str: ServiceEventStatusType
-            state_str: ServiceEventStateType
-
+        registered_services: set[str] = set()
+        services_status = [
+            service_status
+            for service_status in self._get_services()
+            if self._filter_service(service_status["unit"])
+            and "load" in service_status["load"]
+        ]
+        if self.b_events:
+            # Resolve all pids at once instead of spawning processes per service
+            pids = self._pids_for_services([s["unit"] for s in services_status])
+            proc_tree = scan_proc_tree()
+        for service_status in services_status:
             service = service_status["unit"]
-            if self._filter_service(service) and "load" in service_status["load"]:
-                if "active" in service_status["active"]:
-                    status_str = service_status["sub"]
-                    state_str = "on"
-                elif "inactive" in service_status["active"]:
-                    status_str = service_status["sub"]
-                    state_str = "off"
-                elif "failed" in service_status["active"]:
-                    status_str = service_status["sub"]
-                    state_str = "off"
-                else:
-                    status_str = service_status["sub"]
-                    state_str = "off"
+            # Only an active service is on, the other active states are all off
+            state_str: ServiceEventStateType = (
+                "on" if service_status["active"] == "active" else "off"
+            )
+            status_str: ServiceEventStatusType = service_status["sub"]
 
-                if self.b_events:
-                    registered_services.append(service)
-                    self._register_service(
-                        {
-                            "name": service,
-                            "description": service_status["description"],
-                            "pid": self._pid_for_service(service),
-                            "cpids": self._child_pids_for_service(service),
-                            "status": status_str,
-                            "state": state_str,
-                        }
-                    )
-                    if service in self.pending_destroy_operations:
-                        del self.pending_destroy_operations[service]
-                        events_logger.debug("Removing pending delete for %s.", service)
+            if self.b_events:
+                pid = pids[service]
+                registered_services.add(service)
+                self._register_service(
+                    {
+                        "name": service,
+                        "description": service_status["description"],
+                        "pid": pid,
+                        # pid 0 would match the kernel processes
+                        "cpids": proc_tree.get(pid, []) if pid else [],
+                        "status": status_str,
+                        "state": state_str,
+                    }
+                )
+                if service in self.pending_destroy_operations:
+                    del self.pending_destroy_operations[service]
+                    events_logger.debug("Removing pending delete for %s.", service)
 
         for service in self.known_event_services:
             if (
@@ -614,8 +887,23 @@ class Systemctl2Mqtt:
                 and service not in registered_services
             ):
                 events_logger.debug("Mark as pending to delete for %s.", service)
-                del self.pending_destroy_operations[service]
-                self.pending_destroy_operations[service] = time()
+                destroyed_at = monotonic()
+                self.pending_destroy_operations[service] = destroyed_at
+                self.pending_destroy_order.append((destroyed_at, service))
+
+        self._index_service_pids()
+
+    def _index_service_pids(self) -> None:
+        """Rebuild the index of the main and child pids of the known services.
+
+        The index is replaced as a whole, as the stats thread reads it concurrently.
+        """
+        pid_services: dict[int, str] = {}
+        for service, service_entry in self.known_event_services.items():
+            for pid in (service_entry["pid"], *service_entry["cpids"]):
+                if pid:
+                    pid_services.setdefault(pid, service)
+        self.pid_services = pid_services
 
     def _get_services(self) -> list[SystemctlService]:
         """Get services from systemctl.
@@ -626,148 +914,217 @@ class Systemctl2Mqtt:
             The services
 
         """
+        # Keep the output as bytes, the json decoder takes them directly
         systemctl_list = subprocess.run(
-            SYSTEMCTL_LIST_CMD, capture_output=True, text=True, check=False
+            SYSTEMCTL_LIST_CMD, capture_output=True, check=False
         )
         return [
             service
             for line in systemctl_list.stdout.splitlines()
-            for service in json.loads(line)
+            for service in json_loads(line)
         ]
 
-    def _pid_for_service(self, service: str) -> int:
-        """Get PID for service.
+    def _pids_for_services(self, services: list[str]) -> dict[str, int]:
+        """Get PIDs for multiple services with a single systemctl call.
 
         Parameters
         ----------
-        service
-            The service
+        services
+            The services
 
         Returns
         -------
-        int
-            The PID of the service
+        dict[str, int]
+            The PID of each service
 
         """
-        service_pid = subprocess.run(
-            SYSTEMCTL_PID_PRE_CMD + [service],
+        if not services:
+            return {}
+        services_pid = subprocess.run(
+            SYSTEMCTL_PID_PRE_CMD + ["--", *services],
             capture_output=True,
-            text=True,
             check=False,
         )
-        pid = int(service_pid.stdout.strip())
-        return pid
+        # One value per service, separated by empty lines
+        return dict(zip(services, map(int, services_pid.stdout.split()), strict=True))
+
+    def _discovery_payload(self, entry: ServiceEntry) -> str:
+        """Serialize a discovery entry and complete it with the shared discovery fields.
+
+        Parameters
+        ----------
+        entry
+            The discovery entry without the shared fields
+
+        Returns
+        -------
+        str
+            The json payload for the discovery topic
+
+        """
+        return f"{self.discovery_head}, {json.dumps(clean_for_discovery(entry))[1:]}"
 
-    def _child_pids_for_service(self, service: str) -> list[int]:
-        """Get PID for service.
+    def _service_topics(self, service: str) -> tuple[str, str]:
+        """Get the events and stats topics of a service, formatting them once.
 
         Parameters
         ----------
         service
-            The service
+            The service name
 
         Returns
         -------
-        list[int]
-            The child PIDs of the service
+        tuple[str, str]
+            The events topic and the stats topic
 
         """
-        pid = self._pid_for_service(service)
+        topics = self.service_topics.get(service)
+        if topics is None:
+            topics = (
+                self.events_topic.format(service),
+                self.stats_topic.format(service),
+            )
+            self.service_topics[service] = topics
+        return topics
 
-        service_pid = subprocess.run(
-            SYSTEMCTL_CHILD_PID_PRE_CMD + [str(pid)] + SYSTEMCTL_CHILD_PID_POST_CMD,
-            capture_output=True,
-            text=True,
-            check=False,
+    def _event_payload(self, service_entry: ServiceEvent) -> str:
+        """Serialize a service event, reusing the serialized fields which rarely change.
+
+        Parameters
+        ----------
+        service_entry : ServiceEvent
+            The service event to serialize
+
+        Returns
+        -------
+        str
+            The json payload for the events topic
+
+        """
+        # The child pids are always replaced by a new list, never changed in place, so no copy is needed
+        stable = (
+            service_entry["description"],
+            service_entry["pid"],
+            service_entry["cpids"],
         )
-        pids = list(map(int, service_pid.stdout.strip().split()))
-        return pids
+        cached = self.event_payload_prefixes.get(service_entry["name"])
+        if cached is None or cached[0] != stable:
+            prefix = json.dumps(
+                {
+                    "name": service_entry["name"],
+                    "description": service_entry["description"],
+                    "pid": service_entry["pid"],
+                    "cpids": service_entry["cpids"],
+                }
+            )[:-1]
+            cached = (stable, prefix)
+            self.event_payload_prefixes[service_entry["name"]] = cached
+        # Status and state are plain systemd identifiers, which need no escaping
+        return f'{cached[1]}, "status": "{service_entry["status"]}", "state": "{service_entry["state"]}"}}'
 
-    def _register_service(self, service_entry: ServiceEvent) -> None:
-        """Create discovery topics of service for all entities for home assistant.
+    def _build_discovery_payloads(
+        self, service_entry: ServiceEvent
+    ) -> list[tuple[str, str]]:
+        """Build the discovery topics and payloads of a service for all entities for home assistant.
 
         Parameters
         ----------
         service_entry : ServiceEvent
             The service event with the data to register a service
 
-        Raises
-        ------
-        Systemctl2MqttConnectionError
-            If the mqtt client could not send the data
+        Returns
+        -------
+        list[tuple[str, str]]
+            The discovery topics with their payloads
 
         """
         service = service_entry["name"]
-        self.known_event_services[service] = service_entry
+        device = self._device_definition(service_entry)
 
         # Events
         registration_topic = self.discovery_binary_sensor_topic.format(
-            INVALID_HA_TOPIC_CHARS.sub("_", f"{service}_events")
+            sanitize_topic(f"{service}_events")
         )
-        events_topic = self.events_topic.format(service)
+        events_topic, stats_topic = self._service_topics(service)
         registration_packet = ServiceEntry(
             {
                 "name": "Events",
                 "unique_id": f"{self.cfg['mqtt_topic_prefix']}_{self.cfg['systemctl2mqtt_hostname']}_{registration_topic}",
-                "availability_topic": f"{self.cfg['mqtt_topic_prefix']}/{self.cfg['systemctl2mqtt_hostname']}/status",
-                "payload_available": "online",
-                "payload_not_available": "offline",
                 "state_topic": events_topic,
                 "value_template": '{{ value_json.state if value_json is not undefined and value_json.state is not undefined else "off" }}',
                 "payload_on": "on",
                 "payload_off": "off",
                 "icon": "mdi:console",
-                "unit_of_measurement": None,
-                "device": self._device_definition(service_entry),
+                "device": device,
                 "device_class": "running",
                 "json_attributes_topic": events_topic,
-                "qos": self.cfg["mqtt_qos"],
             }
         )
-        self._mqtt_send(
-            registration_topic,
-            json.dumps(clean_for_discovery(registration_packet)),
-            retain=True,
-        )
-        self._mqtt_send(
-            events_topic,
-            json.dumps(service_entry),
-            retain=True,
-        )
+        payloads = [(registration_topic, self._discovery_payload(registration_packet))]
 
         # Stats
+        if not self.b_stats:
+            return payloads
+
         for label, field, device_class, unit, icon in STATS_REGISTRATION_ENTRIES:
             registration_topic = self.discovery_sensor_topic.format(
-                INVALID_HA_TOPIC_CHARS.sub("_", f"{service}_{field}_stats")
+                sanitize_topic(f"{service}_{field}_stats")
             )
-            stats_topic = self.stats_topic.format(service)
             registration_packet = ServiceEntry(
                 {
                     "name": label,
                     "unique_id": f"{self.cfg['mqtt_topic_prefix']}_{self.cfg['systemctl2mqtt_hostname']}_{registration_topic}",
-                    "availability_topic": f"{self.cfg['mqtt_topic_prefix']}/{self.cfg['systemctl2mqtt_hostname']}/status",
-                    "payload_available": "online",
-                    "payload_not_available": "offline",
                     "state_topic": stats_topic,
-                    "value_template": f"{{{{ value_json.{ field } if value_json is not undefined and value_json.{ field } is not undefined else None }}}}",
+                    "value_template": STATS_VALUE_TEMPLATES[field],
                     "unit_of_measurement": unit,
                     "icon": icon,
-                    "payload_on": None,
-                    "payload_off": None,
                     "json_attributes_topic": stats_topic,
-                    "device_class": device_class,
-                    "device": self._device_definition(service_entry),
-                    "qos": self.cfg["mqtt_qos"],
+                    "device": device,
                 }
             )
-            self._mqtt_send(
-                registration_topic,
-                json.dumps(clean_for_discovery(registration_packet)),
-                retain=True,
+            # Only set when given, so the entry holds no empty fields
+            if device_class is not None:
+                registration_packet["device_class"] = device_class
+            payloads.append(
+                (registration_topic, self._discovery_payload(registration_packet))
             )
+        return payloads
+
+    def _register_service(self, service_entry: ServiceEvent) -> None:
+        """Create discovery topics of service for all entities for home assistant.
+
+        Parameters
+        ----------
+        service_entry : ServiceEvent
+            The service event with the data to register a service
+
+        Raises
+        ------
+        Systemctl2MqttConnectionError
+            If the mqtt client could not send the data
+
+        """
+        service = service_entry["name"]
+        self.known_event_services[service] = service_entry
+
+        # The discovery payloads only depend on the service name, reuse them on reloads
+        payloads = self.discovery_payloads.get(service)
+        if payloads is None:
+            payloads = self._build_discovery_payloads(service_entry)
+            self.discovery_payloads[service] = payloads
+        for registration_topic, registration_payload in payloads:
+            self._mqtt_send_retained(registration_topic, registration_payload)
+
+        events_topic, stats_topic = self._service_topics(service)
+
+        # Events
+        self._mqtt_send_retained(events_topic, self._event_payload(service_entry))
+
+        # Stats
+        if self.b_stats:
             self._mqtt_send(
                 stats_topic,
-                json.dumps({}),
+                "{}",
                 retain=True,
             )
 
@@ -785,54 +1142,60 @@ class Systemctl2Mqtt:
             If the mqtt client could not send the data
 
         """
+        self.discovery_payloads.pop(service, None)
+        self.event_payload_prefixes.pop(service, None)
+        events_topic, stats_topic = self._service_topics(service)
+        del self.service_topics[service]
+
         # Events
-        self._mqtt_send(
-            self.discovery_binary_sensor_topic.format(
-                INVALID_HA_TOPIC_CHARS.sub("_", f"{service}_events")
-            ),
-            "",
-            retain=True,
+        registration_topic = self.discovery_binary_sensor_topic.format(
+            sanitize_topic(f"{service}_events")
         )
+        self.published_retained.pop(registration_topic, None)
+        self._mqtt_send(registration_topic, "", retain=True)
+        self.published_retained.pop(events_topic, None)
         self._mqtt_send(
-            self.events_topic.format(service),
+            events_topic,
             "",
             retain=True,
         )
 
         # Stats
         for _, field, _, _, _ in STATS_REGISTRATION_ENTRIES:
-            self._mqtt_send(
-                self.discovery_sensor_topic.format(
-                    INVALID_HA_TOPIC_CHARS.sub("_", f"{service}_{field}_stats")
-                ),
-                "",
-                retain=True,
+            registration_topic = self.discovery_sensor_topic.format(
+                sanitize_topic(f"{service}_{field}_stats")
             )
+            self.published_retained.pop(registration_topic, None)
+            self._mqtt_send(registration_topic, "", retain=True)
         self._mqtt_send(
-            self.stats_topic.format(service),
+            stats_topic,
             "",
             retain=True,
         )
 
-    def _match_service(self, service: str, to_check: str) -> bool:
-        """Match a service to a value.
+    def _match_service(
+        self,
+        service: str,
+        service_filter: tuple[frozenset[str], list[re.Pattern[str]]],
+    ) -> bool:
+        """Match a service to the compiled entries of a whitelist or blacklist.
 
         Parameters
         ----------
         service
             The service to match
-        to_check
-            The string to check it with
+        service_filter
+            The compiled entries to check it with
 
         Returns
         -------
         bool
-            Whether the service matches the string
+            Whether the service matches any of the entries
 
         """
-        return (
-            service in (to_check, f"{to_check}.service")
-            or re.compile(to_check).match(service) is not None
+        literals, patterns = service_filter
+        return service in literals or any(
+            pattern.match(service) is not None for pattern in patterns
         )
 
     def _filter_service(self, service: str) -> bool:
@@ -849,19 +1212,18 @@ class Systemctl2Mqtt:
             Whether the service should be considered
 
         """
-        if len(self.cfg["service_whitelist"]) > 0:
-            for to_check in self.cfg["service_whitelist"]:
-                if self._match_service(service, to_check):
-                    events_logger.debug(
-                        "Match service '%s' with whitelist entry: %s", service, to_check
-                    )
-                    break
-            else:
-                return False
-        for to_check in self.cfg["service_blacklist"]:
-            if self._match_service(service, to_check):
-                return False
-        return True
+        result = self.service_filter_results.get(service)
+        if result is None:
+            result = (
+                not self.cfg["service_whitelist"]
+                or self._match_service(service, self.service_whitelist)
+            ) and not self._match_service(service, self.service_blacklist)
+            events_logger.debug("Filter service '%s': %s", service, result)
+            if len(self.service_filter_results) >= SERVICE_FILTER_CACHE_SIZE:
+                # Transient units would let the cache grow without bounds
+                self.service_filter_results.clear()
+            self.service_filter_results[service] = result
+        return result
 
     def _remove_destroyed_services(self) -> None:
         """Remove any destroyed services that have passed the TTL.
@@ -873,21 +1235,31 @@ class Systemctl2Mqtt:
 
         """
         try:
-            for (
-                service,
-                destroyed_at,
-            ) in self.pending_destroy_operations.copy().items():
-                if time() - destroyed_at > self.cfg["destroyed_service_ttl"]:
+            removed = False
+            # The ttl is the same for all, so the oldest operation expires first
+            expired_at = monotonic() - self.cfg["destroyed_service_ttl"]
+            pending_destroy_order = self.pending_destroy_order
+            while pending_destroy_order and pending_destroy_order[0][0] < expired_at:
+                destroyed_at, service = pending_destroy_order[0]
+                # Skip operations cancelled or marked again since
+                if self.pending_destroy_operations.get(service) == destroyed_at:
                     main_logger.info("Removing service %s from MQTT.", service)
                     self._unregister_service(service)
                     del self.pending_destroy_operations[service]
+                    self.known_event_services.pop(service, None)
+                    self.known_stat_services.pop(service, None)
+                    self.last_stat_services.pop(service, None)
+                    removed = True
+                pending_destroy_order.popleft()
+            if removed:
+                self._index_service_pids()
         except Exception as e:
             raise Systemctl2MqttEventsException(
                 "Could not remove destroyed services"
             ) from e
 
     def _handle_events_queue(self) -> None:
-        """Check if any event is present in the queue and process it.
+        """Process the queued events and send each touched service once.
 
         Raises
         ------
@@ -895,88 +1267,127 @@ class Systemctl2Mqtt:
             If anything goes wrong in the processing of the events
 
         """
-        event = {}
+        if not self.b_events:
+            return
 
-        systemctl_events_qsize = self.systemctl_events.qsize()
+        # Drain only what is queued now, events arriving meanwhile wait for the next tick
+        services: dict[str, None] = {}
+        started_services: dict[str, None] = {}
+        # A failing event must not drop the updates already applied by the others
+        error: Systemctl2MqttEventsException | None = None
+        popleft = self.systemctl_events.popleft
+        for _ in range(len(self.systemctl_events)):
+            try:
+                event = popleft()
+            except IndexError:
+                break
+            try:
+                service, started = self._handle_event(event)
+            except Systemctl2MqttEventsException as ex:
+                # Already logged, the first error is raised once the batch is sent
+                if error is None:
+                    error = ex
+                continue
+            services[service] = None
+            if started:
+                started_services[service] = None
+
+        if started_services:
+            # Resolve the new pids of all started services at once
+            try:
+                pids = self._pids_for_services(list(started_services))
+            except Exception as ex:
+                events_logger.exception(
+                    "Could not get the pids of the started services"
+                )
+                if error is None:
+                    error = Systemctl2MqttEventsException(
+                        "Could not get the pids of the started services"
+                    )
+                    error.__cause__ = ex
+            else:
+                for service, pid in pids.items():
+                    self.known_event_services[service]["pid"] = pid
+                self._index_service_pids()
+
+        for service in services:
+            service_entry = self.known_event_services.get(service)
+            if service_entry is None:
+                events_logger.debug("Skip sending unknown service: %s", service)
+                continue
+            events_logger.debug("Sending mqtt payload")
+            self._mqtt_send_retained(
+                self._service_topics(service)[0],
+                self._event_payload(service_entry),
+            )
+
+        if error is not None:
+            raise error
+
+    def _handle_event(self, event: dict[str, str]) -> tuple[str, bool]:
+        """Process an event and update the state of its service.
+
+        Parameters
+        ----------
+        event
+            The journalctl event
+
+        Returns
+        -------
+        tuple[str, bool]
+            The service touched by the event and whether it has been started, which changes its pid
+
+        Raises
+        ------
+        Systemctl2MqttEventsException
+            If anything goes wrong in the processing of the event
+
+        """
+        started = False
         try:
-            if self.b_events:
-                event = self.systemctl_events.get(block=False)
-            events_logger.debug("Events queue length: %s", systemctl_events_qsize)
-        except Empty:
-            # No data right now, just move along.
-            pass
-
-        if self.b_events and systemctl_events_qsize > 0:
-            if event:
-                try:
-                    service: str = event["UNIT"]
+            service: str = event["UNIT"]
+            events_logger.debug("Have an event to process for Service: %s", service)
+
+            if event["MESSAGE"] == "Reloading.":
+                self._reload_services()
+
+            if "JOB_TYPE" in event:
+                service_entry = self.known_event_services[service]
+                job_type = event["JOB_TYPE"]
+                job_result = event.get("JOB_RESULT")
+                job_state = JOB_TYPE_STATES.get(job_type)
+                if job_result is None:
                     events_logger.debug(
-                        "Have an event to process for Service: %s", service
+                        "Skip pending event for service %s",
+                        service,
                     )
 
-                    if event["MESSAGE"] == "Reloading.":
-                        self._reload_services()
-
-                    if "JOB_TYPE" in event:
-                        if "JOB_RESULT" not in event:
-                            events_logger.debug(
-                                "Skip pending event for service %s",
-                                service,
-                            )
-
-                        if event["JOB_TYPE"] == "start" and "JOB_RESULT" in event:
-                            events_logger.info("Service %s has been started.", service)
-                            self.known_event_services[service]["status"] = (
-                                "running" if event["JOB_RESULT"] == "done" else "failed"
-                            )
-                            self.known_event_services[service]["state"] = "on"
-                            self.known_event_services[service]["pid"] = (
-                                self._pid_for_service(service)
-                            )
-
-                        elif event["JOB_TYPE"] == "stop" and "JOB_RESULT" in event:
-                            # Add this service to pending_destroy_operations.
-                            events_logger.info("Service %s has been stopped.", service)
-                            self.known_event_services[service]["status"] = (
-                                "exited" if event["JOB_RESULT"] == "done" else "failed"
-                            )
-                            self.known_event_services[service]["state"] = "off"
-
-                        elif event["JOB_TYPE"] == "restart" and "JOB_RESULT" in event:
-                            events_logger.info("Service %s has restarted.", service)
-                            self.known_event_services[service]["status"] = (
-                                "exited" if event["JOB_RESULT"] == "done" else "failed"
-                            )
-                            self.known_event_services[service]["state"] = "off"
-
-                        else:
-                            events_logger.debug(
-                                "Unknown event: %s",
-                                event.get("JOB_TYPE", "--event not found--"),
-                            )
-
-                    else:
-                        events_logger.debug(
-                            "Skip line: %s", event.get("MESSAGE", str(event))
-                        )
-
-                except Exception as ex:
-                    events_logger.exception("Error parsing line: %s", event)
-                    events_logger.exception("Error of parsed line:")
-                    events_logger.debug(ex)
-                    raise Systemctl2MqttEventsException(
-                        f"Error parsing line: {event}"
-                    ) from ex
-
-                events_logger.debug("Sending mqtt payload")
-                self._mqtt_send(
-                    self.events_topic.format(service),
-                    json.dumps(self.known_event_services[service]),
-                    retain=True,
-                )
+                elif job_state is None:
+                    events_logger.debug("Unknown event: %s", job_type)
+
+                else:
+                    events_logger.info(
+                        "Service %s finished %s job: %s", service, job_type, job_result
+                    )
+                    status, service_entry["state"] = job_state
+                    service_entry["status"] = (
+                        status if job_result == "done" else "failed"
+                    )
+                    started = job_type == "start"
+
+            else:
+                events_logger.debug("Skip line: %s", event.get("MESSAGE", str(event)))
+
+        except Exception as ex:
+            events_logger.exception("Error parsing line: %s", event)
+            events_logger.exception("Error of parsed line:")
+            events_logger.debug(ex)
+            raise Systemctl2MqttEventsException(f"Error parsing line: {event}") from ex
+
+        return service, started
 
     def _handle_stats_queue(self) -> None:
-        """Check if any stat is present in the queue and process it.
+        """Process the queued stats, so their payloads are published with one flush.
 
         Raises
         ------
@@ -984,150 +1395,181 @@ class Systemctl2Mqtt:
             If anything goes wrong in the processing of the stats
 
         """
-        stat = []
+        if not self.b_stats:
+            return
+
+        # Scanned at most once per drain, and only when a service is sent
+        proc_tree: dict[int, list[int]] | None = None
+
+        # Drain only what is queued now, stats arriving meanwhile wait for the next tick
+        popleft = self.systemctl_stats.popleft
+        for _ in range(len(self.systemctl_stats)):
+            try:
+                stat = popleft()
+            except IndexError:
+                break
+            proc_tree = self._handle_stat(stat, proc_tree)
+
+    def _handle_stat(
+        self,
+        stat: tuple[int, float, float, str, int],
+        proc_tree: dict[int, list[int]] | None,
+    ) -> dict[int, list[int]] | None:
+        """Process a stat and send the stats of its service for the main pid.
+
+        Parameters
+        ----------
+        stat
+            The pid, cpu usage, resident memory, service and main pid of the service
+        proc_tree
+            The child pids by parent pid shared by the stats of one drain, None if not scanned yet
+
+        Returns
+        -------
+        dict[int, list[int]] | None
+            The child pids by parent pid, scanned when needed to send the stats
+
+        Raises
+        ------
+        Systemctl2MqttStatsException
+            If anything goes wrong in the processing of the stat
+
+        """
         send_mqtt = False
 
-        systemctl_stats_qsize = self.systemctl_stats.qsize()
+        #################################
+        # Examples:
+        # (506213, 16.8, 65232.0, "ffmpeg.service", 506213)
+        # (506212,  4.0, 64000.0, "ffmpeg.service", 506213)
+        #
+        # Index 0: pid
+        # Index 1: cpu usage in %
+        # Index 2: resident memory in KB
+        # Index 3: service name
+        # Index 4: parent pid of the service
+        #################################
+        pid, cpu, memory_kb, service, ppid = stat
+
         try:
-            if self.b_stats:
-                stat = self.systemctl_stats.get(block=False)
-            stats_logger.debug("Stats queue length: %s", systemctl_stats_qsize)
-        except Empty:
-            # No data right now, just move along.
-            return
+            stats_logger.debug(
+                "Have a Stat to process for service: %s (%s)", service, pid
+            )
 
-            #################################
-            # Examples:
-            #    PID USER      PR  NI    VIRT    RES    SHR S  %CPU  %MEM     TIME+ COMMAND
-            # 506213 root      20   0  365920  65232  35840 S  16.8   1.6 151:22.70 ffmpeg
-            # 506212 root      20   0  772704  64000  45056 S   4.0   1.5  32:58.94 rpicam-vid
-            #    736 root      20   0  259264  19456   5120 S   2.0   0.5      7,30 python
-            #
-            #      0    1       2   3       4      5      6 7     8     9        10 11
-            #
-            # Index -2: service name
-            # Index -1: parent pid of the service
-            #################################
-
-        if self.b_stats and systemctl_stats_qsize > 0:
-            if stat and len(stat) > 0:
-                try:
-                    pid = int(stat[0])
-                    ppid = int(stat[-1])
-                    service: str = stat[-2]
-                    stats_logger.debug(
-                        "Have a Stat to process for service: %s (%s)", service, pid
+            # Stats may still be queued for a service removed in the meantime
+            if service not in self.known_event_services:
+                stats_logger.debug("Drop stat of removed service: %s", service)
+                return proc_tree
+
+            stat_times = self.known_stat_services[service]
+            now = monotonic()
+            # Samples arrive once per interval, tolerate a late handling of the previous one
+            check_date = now - self.cfg["stats_record_seconds"] / 2
+            # Never processed, so the first stat of a pid is always processed
+            pid_date = stat_times.get(pid, float("-inf"))
+            stats_logger.debug("Compare dates %s %s", check_date, pid_date)
+
+            if pid_date <= check_date:
+                # To reduce traffic, only send for the parent pid
+                send_mqtt = ppid == pid
+
+                stats_logger.info("Processing %s (%d) stats", service, pid)
+                stat_times[pid] = now
+
+                # The totals are only summed up when the service stats are sent
+                service_stats = self.last_stat_services.get(service)
+                if service_stats is None:
+                    service_stats = ServiceStats(
+                        {
+                            "name": service,
+                            "host": self.cfg["systemctl2mqtt_hostname"],
+                            "cpu": 0,
+                            "memory": 0,
+                            "pid_stats": {},
+                        }
                     )
+                    self.last_stat_services[service] = service_stats
+                memory = memory_kb / 1024  # KB --> MB
+                # Update the stats of a known pid in place instead of replacing them
+                pid_stats = service_stats["pid_stats"].get(pid)
+                if pid_stats is None:
+                    pid_stats = PIDStats({"pid": pid, "cpu": cpu, "memory": memory})
+                    service_stats["pid_stats"][pid] = pid_stats
+                else:
+                    pid_stats["cpu"] = cpu
+                    pid_stats["memory"] = memory
+                stats_logger.debug("Printing pid stats: %s", pid_stats)
+            else:
+                stats_logger.debug(
+                    "Not processing record as duplicate record or too young: %s ",
+                    service,
+                )
 
-                    if service not in self.known_stat_services:
-                        self.known_stat_services[service] = {}
-                        self.last_stat_services[service] = {}
-                    if pid not in self.known_stat_services[service]:
-                        self.known_stat_services[service][pid] = ServiceStatsRef(
-                            {"last": datetime.datetime(2020, 1, 1)}
-                        )
+        except Exception as ex:
+            stats_logger.exception("Error parsing line: %s", str(stat))
+            stats_logger.exception("Error of parsed line:")
+            stats_logger.debug(ex)
+            raise Systemctl2MqttStatsException(
+                f"Error parsing line: {str(stat)}"
+            ) from ex
 
-                    check_date = datetime.datetime.now() - datetime.timedelta(
-                        seconds=self.cfg["stats_record_seconds"]
-                    )
-                    pid_date = self.known_stat_services[service][pid]["last"]
-                    stats_logger.debug("Compare dates %s %s", check_date, pid_date)
-
-                    if pid_date <= check_date:
-                        # To reduce traffic, only send for the parent pid
-                        send_mqtt = ppid == pid
-
-                        stats_logger.info("Processing %s (%d) stats", service, pid)
-                        self.known_stat_services[service][pid]["last"] = (
-                            datetime.datetime.now()
-                        )
-                        # delta_seconds = (
-                        #     self.known_stat_services[service][pid]["last"] - container_date
-                        # ).total_seconds()
-
-                        pid_stats = PIDStats(
-                            {
-                                "pid": pid,
-                                "cpu": float(stat[8]),
-                                "memory": float(stat[5]) / 1024,  # KB --> MB
-                            }
-                        )
-                        stats_logger.debug("Printing pid stats: %s", pid_stats)
-
-                        service_stats = ServiceStats(
-                            {
-                                "name": service,
-                                "host": self.cfg["systemctl2mqtt_hostname"],
-                                "cpu": 0,
-                                "memory": 0,
-                                "pid_stats": self.last_stat_services[service][
-                                    "pid_stats"
-                                ]
-                                if self.last_stat_services[service]
-                                else {},
-                            }
-                        )
-                        service_stats["pid_stats"][pid] = pid_stats
-
-                        for pid_stat in service_stats["pid_stats"].values():
-                            service_stats["memory"] += pid_stat["memory"]
-                            service_stats["cpu"] += pid_stat["cpu"]
-
-                        self.last_stat_services[service] = service_stats
-                    else:
-                        stats_logger.debug(
-                            "Not processing record as duplicate record or too young: %s ",
-                            service,
-                        )
-
-                except Exception as ex:
-                    stats_logger.exception("Error parsing line: %s", str(stat))
-                    stats_logger.exception("Error of parsed line:")
-                    stats_logger.debug(ex)
-                    raise Systemctl2MqttStatsException(
-                        f"Error parsing line: {str(stat)}"
-                    ) from ex
-
-                if send_mqtt:
-                    stats_logger.debug(
-                        "Printing service stats: %s", self.last_stat_services[service]
+        if send_mqtt:
+            # The stat of the main pid is sent, so its pid is known without asking systemctl
+            if proc_tree is None:
+                proc_tree = scan_proc_tree()
+            child_pids = proc_tree.get(ppid, [])
+            if child_pids != self.known_event_services[service]["cpids"]:
+                self.known_event_services[service]["cpids"] = child_pids
+                self._index_service_pids()
+            service_stats = self.last_stat_services[service]
+            pid_stats_by_pid = service_stats["pid_stats"]
+            # A set keeps the cleanup linear for services with many workers
+            alive_pids = set(child_pids)
+            alive_pids.add(ppid)
+            # Collect beforehand to avoid "RuntimeError: dictionary changed size during iteration"
+            exited_pids = [pid for pid in pid_stats_by_pid if pid not in alive_pids]
+            if exited_pids:
+                stats_logger.debug(
+                    "Checking for child pids of exited threads to clean up for service: %s",
+                    service,
+                )
+                for pid in exited_pids:
+                    stats_logger.info(
+                        "Cleanup child pid (%d) of service: %s",
+                        pid,
+                        service,
                     )
+                    del pid_stats_by_pid[pid]
+
+            # Summed in one pass over the remaining pids
+            cpu_total = 0.0
+            memory_total = 0.0
+            for pid_stat in pid_stats_by_pid.values():
+                cpu_total += pid_stat["cpu"]
+                memory_total += pid_stat["memory"]
+            service_stats["cpu"] = cpu_total
+            service_stats["memory"] = memory_total
+            stats_logger.debug("Printing service stats: %s", service_stats)
+
+            stats_logger.debug("Sending mqtt payload")
+            self._mqtt_send(
+                self._service_topics(service)[1],
+                json_payload(service_stats),
+                retain=False,
+                # Configs built before the stats qos existed do not have it
+                qos=self.cfg.get("mqtt_stats_qos", MQTT_STATS_QOS_DEFAULT),
+            )
 
-                    child_pids = self._child_pids_for_service(service)
-                    self.known_event_services[service]["cpids"] = child_pids
-                    # Need to iterate keys beforehand to avoid "RuntimeError: dictionary changed size during iteration"
-                    pids = list(self.last_stat_services[service]["pid_stats"].keys())
-                    if len(pids) > 0:
-                        stats_logger.debug(
-                            "Checking for child pids of exited threads to clean up for service: %s",
-                            service,
-                        )
-                        for pid in pids:
-                            if int(pid) != ppid and pid not in child_pids:
-                                stats_logger.info(
-                                    "Cleanup child pid (%d) of service: %s",
-                                    pid,
-                                    service,
-                                )
-                                del self.last_stat_services[service]["pid_stats"][pid]
+        return proc_tree
 
-                    stats_logger.debug("Sending mqtt payload")
-                    self._mqtt_send(
-                        self.stats_topic.format(service),
-                        json.dumps(self.last_stat_services[service]),
-                        retain=False,
-                    )
 
+@lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the Systemctl2mqtt executable once.
 
-def main() -> None:
-    """Run main entry for the Systemctl2mqtt executable.
-
-    Raises
-    ------
-    Systemctl2MqttConfigException
-        Bad config
-    Systemctl2MqttConnectionException
-        If anything with the mqtt connection goes wrong
+    Returns
+    -------
+    argparse.ArgumentParser
+        The argument parser
 
     """
     parser = argparse.ArgumentParser()
@@ -1136,7 +1578,7 @@ def main() -> None:
     )
     parser.add_argument(
         "--name",
-        default=socket.gethostname(),
+        default=SYSTEMCTL2MQTT_HOSTNAME_DEFAULT,
         help="A descriptive name for the docker being monitored (default: hostname)",
     )
     parser.add_argument(
@@ -1152,7 +1594,7 @@ def main() -> None:
     )
     parser.add_argument(
         "--client",
-        default=f"{socket.gethostname()}_{MQTT_CLIENT_ID_DEFAULT}",
+        default=f"{SYSTEMCTL2MQTT_HOSTNAME_DEFAULT}_{MQTT_CLIENT_ID_DEFAULT}",
         help=f"Client Id for MQTT broker client (default: <hostname>_{MQTT_CLIENT_ID_DEFAULT})",
     )
     parser.add_argument(
@@ -1172,6 +1614,13 @@ def main() -> None:
         help="QOS for MQTT broker authentication (default: 1)",
         choices=range(0, 3),
     )
+    parser.add_argument(
+        "--stats-qos",
+        default=MQTT_STATS_QOS_DEFAULT,
+        type=int,
+        help=f"QOS for the periodic stats MQTT messages (default: {MQTT_STATS_QOS_DEFAULT})",
+        choices=range(0, 3),
+    )
     parser.add_argument(
         "--timeout",
         default=MQTT_TIMEOUT_DEFAULT,
@@ -1242,9 +1691,22 @@ def main() -> None:
         type=int,
         default=STATS_RECORD_SECONDS_DEFAULT,
     )
+    return parser
+
+
+def main() -> None:
+    """Run main entry for the Systemctl2mqtt executable.
 
+    Raises
+    ------
+    Systemctl2MqttConfigException
+        Bad config
+    Systemctl2MqttConnectionException
+        If anything with the mqtt connection goes wrong
+
+    """
     try:
-        args = parser.parse_args()
+        args = _build_parser().parse_args()
     except argparse.ArgumentError as e:
         raise Systemctl2MqttConfigException("Cannot start due to bad config") from e
     except argparse.ArgumentTypeError as e:
@@ -1271,6 +1733,7 @@ def main() -> None:
             "service_whitelist": args.whitelist or [],
             "service_blacklist": args.blacklist or [],
             "mqtt_qos": args.qos,
+            "mqtt_stats_qos": args.stats_qos,
             "enable_events": args.events,
             "enable_stats": args.stats,
             "stats_record_seconds": args.interval,
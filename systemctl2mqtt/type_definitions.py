@@ -1,7 +1,6 @@
 """Systemctl2mqtt type definitions."""
 
-from datetime import datetime
-from typing import Literal, TypedDict
+from typing import Literal, NotRequired, TypedDict
 
 ServiceEventStateType = Literal["on", "off"]
 """Service event state"""
@@ -47,6 +46,8 @@ class Systemctl2MqttConfig(TypedDict):
         MQTT topic prefix
     mqtt_qos
         QOS for standard MQTT messages
+    mqtt_stats_qos
+        QOS for the periodic stats MQTT messages
     destroyed_service_ttl
         How long, in seconds, before destroyed services are removed from Home Assistant. Services won't be removed if the service is restarted before the TTL expires.
     service_whitelist
@@ -74,6 +75,7 @@ class Systemctl2MqttConfig(TypedDict):
     mqtt_timeout: int
     mqtt_topic_prefix: str
     mqtt_qos: int
+    mqtt_stats_qos: NotRequired[int]
     destroyed_service_ttl: int
     service_whitelist: list[str]
     service_blacklist: list[str]
@@ -138,14 +140,16 @@ class ServiceEvent(TypedDict):
 class ServiceStatsRef(TypedDict):
     """A Service stats ref object compare between current and past stats.
 
+    Deprecated, the time of the last stat rotation is now kept directly per pid.
+
     Attributes
     ----------
     last
-        When the last stat rotation happened
+        When the last stat rotation happened, in monotonic seconds
 
     """
 
-    last: datetime
+    last: float
 
 
 class PIDStats(TypedDict):
@@ -223,11 +227,11 @@ class ServiceEntry(TypedDict):
     icon
         The icon of the sensor to display
     availability_topic
-        The topic to check the availability of the sensor
+        The topic to check the availability of the sensor (shared by all entries)
     payload_available
-        The payload of availability_topic of the sensor when available
+        The payload of availability_topic of the sensor when available (shared by all entries)
     payload_unavailable
-        The payload of availability_topic of the sensor when unavailable
+        The payload of availability_topic of the sensor when unavailable (shared by all entries)
     state_topic
         The topic containing all information for the state of the sensor
     value_template
@@ -245,22 +249,22 @@ class ServiceEntry(TypedDict):
     state_topic
         The topic containing all information for the attributes of the sensor
     qos
-        The QOS of the discovery message
+        The QOS of the discovery message (shared by all entries)
 
     """
 
     name: str
     unique_id: str
-    icon: str | None
-    availability_topic: str
-    payload_available: str
-    payload_not_available: str
+    icon: NotRequired[str]
+    availability_topic: NotRequired[str]
+    payload_available: NotRequired[str]
+    payload_not_available: NotRequired[str]
     state_topic: str
     value_template: str
-    unit_of_measurement: str | None
-    payload_on: str | None
-    payload_off: str | None
+    unit_of_measurement: NotRequired[str]
+    payload_on: NotRequired[str]
+    payload_off: NotRequired[str]
     device: ServiceDeviceEntry
-    device_class: str | None
-    json_attributes_topic: str | None
-    qos: int
+    device_class: NotRequired[str]
+    json_attributes_topic: NotRequired[str]
+    qos: NotRequired[int]